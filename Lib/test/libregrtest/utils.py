@@ -220,6 +220,13 @@ def clear_caches():
     else:
         linecache.clearcache()
 
+    try:
+        traceback = sys.modules['traceback']
+    except KeyError:
+        pass
+    else:
+        traceback._parse_segment.cache_clear()
+
     try:
         mimetypes = sys.modules['mimetypes']
     except KeyError:
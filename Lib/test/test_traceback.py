@@ -2948,6 +2948,33 @@ def test_no_line(self):
         f = traceback.FrameSummary("f", None, "dummy")
         self.assertEqual(f.line, None)
 
+    def test_line_follows_modified_source(self):
+        self.addCleanup(unlink, TESTFN)
+        self.addCleanup(linecache.clearcache)
+        with open(TESTFN, "w", encoding="utf-8") as f:
+            f.write("first = 1\n")
+        linecache.clearcache()
+        f = traceback.FrameSummary(TESTFN, 1, "dummy")
+        self.assertEqual(f.line, "first = 1")
+
+        with open(TESTFN, "w", encoding="utf-8") as f:
+            f.write("second_line = 2\n")
+        linecache.checkcache(TESTFN)
+        linecache.getlines(TESTFN)
+        f = traceback.FrameSummary(TESTFN, 1, "dummy")
+        self.assertEqual(f.line, "second_line = 2")
+
+        # Same size and mtime: only clearing linecache picks up the change.
+        import os
+        st = os.stat(TESTFN)
+        with open(TESTFN, "w", encoding="utf-8") as f:
+            f.write("second_line = 3\n")
+        os.utime(TESTFN, ns=(st.st_atime_ns, st.st_mtime_ns))
+        linecache.clearcache()
+        linecache.getlines(TESTFN)
+        f = traceback.FrameSummary(TESTFN, 1, "dummy")
+        self.assertEqual(f.line, "second_line = 3")
+
     def test_explicit_line(self):
         f = traceback.FrameSummary("f", 1, "dummy", line="line")
         self.assertEqual("line", f.line)
@@ -3015,6 +3042,20 @@ def test_from_list_edited_stack(self):
             ['  File "foo.py", line 2, in fred\n    line\n'],
             s2.format())
 
+    def test_format_skips_repeated_frames(self):
+        s = traceback.StackSummary.from_list(
+            [('foo.py', 1, 'fred', 'line')] * 100)
+        original = traceback.StackSummary.format_frame_summary
+        with unittest.mock.patch.object(
+                traceback.StackSummary, 'format_frame_summary',
+                autospec=True, side_effect=original) as mock:
+            formatted = s.format()
+        self.assertEqual(
+            formatted,
+            ['  File "foo.py", line 1, in fred\n    line\n'] * 3 +
+            ['  [Previous line repeated 97 more times]\n'])
+        self.assertEqual(mock.call_count, 3)
+
     def test_format_smoke(self):
         # For detailed tests see the format_list tests, which consume the same
         # code.
@@ -3030,6 +3071,19 @@ def test_locals(self):
         s = traceback.StackSummary.extract(iter([(f, 6)]), capture_locals=True)
         self.assertEqual(s[0].locals, {'something': '1'})
 
+    def test_locals_captured_eagerly(self):
+        # Locals are captured as representations when the frame is
+        # extracted; the summary must not keep the objects alive or
+        # reflect later changes to them.
+        linecache.updatecache('/foo.py', globals())
+        c = test_code('/foo.py', 'method')
+        value = []
+        f = test_frame(c, globals(), {'something': value})
+        s = traceback.StackSummary.extract(iter([(f, 6)]), capture_locals=True)
+        value.append(1)
+        self.assertEqual(s[0].locals, {'something': '[]'})
+        self.assertIs(type(s[0].locals), dict)
+
     def test_no_locals(self):
         linecache.updatecache('/foo.py', globals())
         c = test_code('/foo.py', 'method')
@@ -3422,6 +3476,12 @@ def test_traceback_header(self):
         exc = traceback.TracebackException(Exception, Exception("haven"), None)
         self.assertEqual(list(exc.format()), ["Exception: haven\n"])
 
+    def test_format_exception_only_is_generator(self):
+        exc = traceback.TracebackException(ValueError, ValueError("x"), None)
+        formatted = exc.format_exception_only()
+        self.assertTrue(inspect.isgenerator(formatted))
+        self.assertEqual(list(formatted), ["ValueError: x\n"])
+
     @requires_debug_ranges()
     def test_print(self):
         def f():
@@ -3486,6 +3546,35 @@ def test_exception_group_construction(self):
         self.assertIsNot(teg1, teg2)
         self.assertEqual(teg1, teg2)
 
+    def test_exception_group_shared_context(self):
+        # A context shared by several exceptions is shown the first time
+        # it is reached, in breadth-first order.
+        context = ValueError('context')
+        excs = [TypeError(i) for i in range(3)]
+        for exc in excs:
+            exc.__context__ = context
+        eg = ExceptionGroup('eg', excs)
+
+        teg = traceback.TracebackException.from_exception(eg)
+        self.assertEqual(teg.exceptions[0].__context__._str, 'context')
+        self.assertIsNone(teg.exceptions[1].__context__)
+        self.assertIsNone(teg.exceptions[2].__context__)
+
+    def test_exception_group_shares_source_lines(self):
+        excs = []
+        for i in range(3):
+            try:
+                raise ValueError(i)
+            except ValueError as e:
+                excs.append(e)
+        eg = ExceptionGroup('eg', excs)
+
+        teg = traceback.TracebackException.from_exception(eg)
+        frames = [te.stack[0] for te in teg.exceptions]
+        self.assertEqual(frames[0].line, 'raise ValueError(i)')
+        self.assertIs(frames[1]._lines, frames[0]._lines)
+        self.assertIs(frames[2]._lines, frames[0]._lines)
+
     def test_exception_group_format_exception_only(self):
         teg = traceback.TracebackException.from_exception(self.eg)
         formatted = ''.join(teg.format_exception_only()).split('\n')
@@ -4268,6 +4357,24 @@ def test_levenshtein_distance_short_circuit(self):
                 res3 = traceback._levenshtein_distance(a, b, threshold)
                 self.assertGreater(res3, threshold, msg=(a, b, threshold))
 
+    def test_caret_anchors_trivial_segments(self):
+        extract = traceback._extract_caret_anchors_from_line_segment
+        for segment in ["x", "x.y", "'a string'", "not x", "a and b", "a == b"]:
+            with self.subTest(segment=segment):
+                self.assertIsNone(extract(segment))
+        for segment in ["a + b", "a[0]", "f()", "a << b"]:
+            with self.subTest(segment=segment):
+                self.assertIsNotNone(extract(segment))
+
+    def test_byte_offset_to_character_offset(self):
+        for line in ["", "abc", "x = ñ + 1", "aé€\U0001f600b"]:
+            encoded = line.encode("utf-8")
+            for offset in range(len(encoded) + 3):
+                expected = len(encoded[:offset].decode("utf-8", "replace"))
+                self.assertEqual(
+                    traceback._byte_offset_to_character_offset(line, offset),
+                    expected, msg=(line, offset))
+
 class TestColorizedTraceback(unittest.TestCase):
     def test_colorized_traceback(self):
         def foo(*args):
@@ -3,12 +3,13 @@
 import os
 import io
 import collections.abc
+import functools
 import itertools
 import linecache
+import re
 import sys
 import textwrap
 import warnings
-from contextlib import suppress
 
 __all__ = ['extract_stack', 'extract_tb', 'format_exception',
            'format_exception_only', 'format_list', 'format_stack',
@@ -28,7 +29,7 @@ def print_list(extracted_list, file=None):
     extract_stack() as a formatted stack trace to the given file."""
     if file is None:
         file = sys.stderr
-    for item in StackSummary.from_list(extracted_list).format():
+    for item in StackSummary.from_list(extracted_list)._iter_format():
         print(item, file=file, end="")
 
 def format_list(extracted_list):
@@ -311,7 +312,7 @@ class FrameSummary:
     """
 
     __slots__ = ('filename', 'lineno', 'end_lineno', 'colno', 'end_colno',
-                 'name', '_lines', '_lines_dedented', 'locals')
+                 'name', '_lines', '_lines_dedented', '_lines_split', 'locals')
 
     def __init__(self, filename, lineno, name, *, lookup_line=True,
             locals=None, line=None,
@@ -333,11 +334,31 @@ def __init__(self, filename, lineno, name, *, lookup_line=True,
         self.name = name
         self._lines = line
         self._lines_dedented = None
+        self._lines_split = None
         if lookup_line:
             self.line
         self.locals = {k: _safe_string(v, 'local', func=repr)
             for k, v in locals.items()} if locals else None
 
+    @classmethod
+    def _from_positions(cls, filename, lineno, name, end_lineno, colno,
+                        end_colno):
+        # Same as cls(filename, lineno, name, lookup_line=False,
+        # end_lineno=end_lineno, colno=colno, end_colno=end_colno), without
+        # the overhead of __init__.  Used when extracting many frames.
+        self = object.__new__(cls)
+        self.filename = filename
+        self.lineno = lineno
+        self.end_lineno = lineno if end_lineno is None else end_lineno
+        self.colno = colno
+        self.end_colno = end_colno
+        self.name = name
+        self._lines = None
+        self._lines_dedented = None
+        self._lines_split = None
+        self.locals = None
+        return self
+
     def __eq__(self, other):
         if isinstance(other, FrameSummary):
             return (self.filename == other.filename and
@@ -367,11 +388,8 @@ def _set_lines(self):
             and self.lineno is not None
             and self.end_lineno is not None
         ):
-            lines = []
-            for lineno in range(self.lineno, self.end_lineno + 1):
-                # treat errors (empty string) and empty lines (newline) as the same
-                lines.append(linecache.getline(self.filename, lineno).rstrip())
-            self._lines = "\n".join(lines) + "\n"
+            self._lines, self._lines_dedented = _get_source_segment(
+                self.filename, self.lineno, self.end_lineno)
 
     @property
     def _original_lines(self):
@@ -387,6 +405,17 @@ def _dedented_lines(self):
             self._lines_dedented = textwrap.dedent(self._lines)
         return self._lines_dedented
 
+    def _split_lines(self):
+        # Returns a tuple of _original_lines and _dedented_lines split into
+        # lists of lines, and the number of characters removed from the start
+        # of the first line by dedenting. Only valid if lines are available.
+        if self._lines_split is None:
+            original = self._original_lines.splitlines()
+            dedented = self._dedented_lines.splitlines()
+            self._lines_split = (
+                original, dedented, len(original[0]) - len(dedented[0]))
+        return self._lines_split
+
     @property
     def line(self):
         self._set_lines()
@@ -396,6 +425,21 @@ def line(self):
         return self._lines.partition("\n")[0].strip()
 
 
+def _get_source_segment(filename, lineno, end_lineno):
+    # Return the (raw, dedented) source text of lines lineno to end_lineno.
+    # Fetch the file's lines once rather than calling getline() per line.
+    source = linecache.getlines(filename)
+    lines = []
+    for lineno in range(lineno, end_lineno + 1):
+        # treat errors (empty string) and empty lines (newline) as the same
+        if 1 <= lineno <= len(source):
+            lines.append(source[lineno - 1].rstrip())
+        else:
+            lines.append('')
+    raw = "\n".join(lines) + "\n"
+    return raw, textwrap.dedent(raw)
+
+
 def walk_stack(f):
     """Walk a stack yielding the frame and line number for each frame.
 
@@ -423,8 +467,18 @@ def walk_tb(tb):
 def _walk_tb_with_full_positions(tb):
     # Internal version of walk_tb that yields full code positions including
     # end line and column information.
+    # Deep recursion repeats the same (code, instruction) pairs, and
+    # co_positions() has to be walked from the start for each lookup.  The
+    # code objects are kept alive by the traceback, so key on their id()
+    # rather than on the code object, whose hash covers all of its contents.
+    seen_positions = {}
     while tb is not None:
-        positions = _get_code_position(tb.tb_frame.f_code, tb.tb_lasti)
+        code = tb.tb_frame.f_code
+        key = (id(code), tb.tb_lasti)
+        positions = seen_positions.get(key)
+        if positions is None:
+            positions = seen_positions[key] = _get_code_position(
+                code, tb.tb_lasti)
         # Yield tb_lineno when co_positions does not have a line number to
         # maintain behavior with walk_tb.
         if positions[0] is None:
@@ -478,11 +532,12 @@ def extended_frame_gen():
 
     @classmethod
     def _extract_from_extended_frame_gen(klass, frame_gen, *, limit=None,
-            lookup_lines=True, capture_locals=False):
+            lookup_lines=True, capture_locals=False, _segments=None):
         # Same as extract but operates on a frame generator that yields
         # (frame, (lineno, end_lineno, colno, end_colno)) in the stack.
         # Only lineno is required, the remaining fields can be None if the
-        # information is not available.
+        # information is not available.  _segments may be passed to share
+        # the source lines read between several calls.
         builtin_limit = limit is BUILTIN_EXCEPTION_LIMIT
         if limit is None or builtin_limit:
             limit = getattr(sys, 'tracebacklimit', None)
@@ -503,23 +558,32 @@ def _extract_from_extended_frame_gen(klass, frame_gen, *, limit=None,
             co = f.f_code
             filename = co.co_filename
             name = co.co_name
-            fnames.add(filename)
-            linecache.lazycache(filename, f.f_globals)
+            if filename not in fnames:
+                fnames.add(filename)
+                linecache.lazycache(filename, f.f_globals)
             # Must defer line lookups until we have called checkcache.
             if capture_locals:
-                f_locals = f.f_locals
+                result.append(FrameSummary(
+                    filename, lineno, name, lookup_line=False,
+                    locals=f.f_locals, end_lineno=end_lineno, colno=colno,
+                    end_colno=end_colno))
             else:
-                f_locals = None
-            result.append(FrameSummary(
-                filename, lineno, name, lookup_line=False, locals=f_locals,
-                end_lineno=end_lineno, colno=colno, end_colno=end_colno))
+                result.append(FrameSummary._from_positions(
+                    filename, lineno, name, end_lineno, colno, end_colno))
         for filename in fnames:
             linecache.checkcache(filename)
 
-        # If immediate lookup was desired, trigger lookups now.
+        # If immediate lookup was desired, trigger lookups now. Frames at
+        # the same location (as in recursion) share the lines read once.
         if lookup_lines:
+            segments = {} if _segments is None else _segments
             for f in result:
-                f.line
+                key = (f.filename, f.lineno, f.end_lineno)
+                if key in segments:
+                    f._lines, f._lines_dedented = segments[key]
+                else:
+                    f._set_lines()
+                    segments[key] = f._lines, f._lines_dedented
         return result
 
     @classmethod
@@ -574,10 +638,12 @@ def format_frame_summary(self, frame_summary, **kwargs):
                 frame_summary.end_colno is None
             ):
                 # only output first line if column information is missing
-                row.append(textwrap.indent(frame_summary.line, '    ') + "\n")
+                line = frame_summary.line
+                row.append(f'    {line}\n' if line else '\n')
             else:
                 # get first and last line
-                all_lines_original = frame_summary._original_lines.splitlines()
+                all_lines_original, all_lines_dedented, dedent_characters = (
+                    frame_summary._split_lines())
                 first_line = all_lines_original[0]
                 # assume all_lines_original has enough lines (since we constructed it)
                 last_line = all_lines_original[frame_summary.end_lineno - frame_summary.lineno]
@@ -586,12 +652,11 @@ def format_frame_summary(self, frame_summary, **kwargs):
                 start_offset = _byte_offset_to_character_offset(first_line, frame_summary.colno)
                 end_offset = _byte_offset_to_character_offset(last_line, frame_summary.end_colno)
 
-                all_lines = frame_summary._dedented_lines.splitlines()[
+                all_lines = all_lines_dedented[
                     :frame_summary.end_lineno - frame_summary.lineno + 1
                 ]
 
                 # adjust start/end offset based on dedent
-                dedent_characters = len(first_line) - len(all_lines[0])
                 start_offset = max(0, start_offset - dedent_characters)
                 end_offset = max(0, end_offset - dedent_characters)
 
@@ -607,8 +672,10 @@ def format_frame_summary(self, frame_summary, **kwargs):
 
                 # attempt to parse for anchors
                 anchors = None
-                with suppress(Exception):
+                try:
                     anchors = _extract_caret_anchors_from_line_segment(segment)
+                except Exception:
+                    pass
 
                 # only use carets if there are anchors or the carets do not span all lines
                 show_carets = False
@@ -657,28 +724,36 @@ def format_frame_summary(self, frame_summary, **kwargs):
 
                 def output_line(lineno):
                     """output all_lines[lineno] along with carets"""
-                    result.append(all_lines[lineno] + "\n")
+                    source_line = all_lines[lineno]
+                    result.append(source_line + "\n")
                     if not show_carets:
                         return
-                    num_spaces = len(all_lines[lineno]) - len(all_lines[lineno].lstrip())
-                    carets = []
-                    num_carets = dp_end_offset if lineno == len(all_lines) - 1 else _display_width(all_lines[lineno])
-                    # compute caret character for each position
-                    for col in range(num_carets):
-                        if col < num_spaces or (lineno == 0 and col < dp_start_offset):
-                            # before first non-ws char of the line, or before start of instruction
-                            carets.append(' ')
-                        elif anchors and (
-                            lineno > anchors.left_end_lineno or
-                            (lineno == anchors.left_end_lineno and col >= anchors_left_end_offset)
-                        ) and (
-                            lineno < anchors.right_start_lineno or
-                            (lineno == anchors.right_start_lineno and col < anchors_right_start_offset)
-                        ):
-                            # within anchors
-                            carets.append(secondary_char)
+                    num_spaces = len(source_line) - len(source_line.lstrip())
+                    num_carets = dp_end_offset if lineno == len(all_lines) - 1 else _display_width(source_line)
+                    # blank before first non-ws char of the line, or before start of instruction
+                    blank_end = max(num_spaces, dp_start_offset if lineno == 0 else 0)
+                    blank_end = min(blank_end, num_carets)
+                    # columns [secondary_start, secondary_end) are within anchors
+                    secondary_start = secondary_end = num_carets
+                    if anchors:
+                        if lineno > anchors.left_end_lineno:
+                            secondary_start = 0
+                        elif lineno == anchors.left_end_lineno:
+                            secondary_start = anchors_left_end_offset
+                        if lineno < anchors.right_start_lineno:
+                            secondary_end = num_carets
+                        elif lineno == anchors.right_start_lineno:
+                            secondary_end = anchors_right_start_offset
                         else:
-                            carets.append(primary_char)
+                            secondary_end = 0
+                    secondary_start = min(max(secondary_start, blank_end), num_carets)
+                    secondary_end = min(max(secondary_end, secondary_start), num_carets)
+                    carets = (
+                        ' ' * blank_end +
+                        primary_char * (secondary_start - blank_end) +
+                        secondary_char * (secondary_end - secondary_start) +
+                        primary_char * (num_carets - secondary_end)
+                    )
                     if colorize:
                         # Replace the previous line with a red version of it only in the parts covered
                         # by the carets.
@@ -703,7 +778,7 @@ def output_line(lineno):
                         result[-1] = colorized_line
                         result.append(colorized_carets + "\n")
                     else:
-                        result.append("".join(carets) + "\n")
+                        result.append(carets + "\n")
 
                 # display significant lines
                 sig_lines_list = sorted(significant_lines)
@@ -718,9 +793,10 @@ def output_line(lineno):
                             result.append(f"...<{linediff - 1} lines>...\n")
                     output_line(lineno)
 
-                row.append(
-                    textwrap.indent(textwrap.dedent("".join(result)), '    ', lambda line: True)
-                )
+                # The source lines were dedented as a whole and each of them is
+                # either shown or part of a run replaced by an unindented
+                # marker, so dedenting again would be a no-op: just indent.
+                row.append("".join(['    ' + line for line in result]))
         if frame_summary.locals:
             for name, value in sorted(frame_summary.locals.items()):
                 row.append('    {name} = {value}\n'.format(name=name, value=value))
@@ -739,22 +815,36 @@ def format(self, **kwargs):
         repetitions are shown, followed by a summary line stating the exact
         number of further repetitions.
         """
+        return list(self._iter_format(**kwargs))
+
+    def _iter_format(self, **kwargs):
+        # Generator version of format(), so that callers which consume the
+        # lines one at a time do not have to hold all of them at once.
         colorize = kwargs.get("colorize", False)
-        result = []
         last_file = None
         last_line = None
         last_name = None
         count = 0
+        # The default format_frame_summary() never drops a frame, so
+        # repetitions past the cutoff need not be formatted at all.  An
+        # overridden one may return None, which must not count as a repeat.
+        skip_repeated = (type(self).format_frame_summary is
+                         StackSummary.format_frame_summary)
         for frame_summary in self:
+            is_repeat = not (
+                last_file is None or last_file != frame_summary.filename or
+                last_line is None or last_line != frame_summary.lineno or
+                last_name is None or last_name != frame_summary.name)
+            if skip_repeated and is_repeat and count >= _RECURSIVE_CUTOFF:
+                count += 1
+                continue
             formatted_frame = self.format_frame_summary(frame_summary, colorize=colorize)
             if formatted_frame is None:
                 continue
-            if (last_file is None or last_file != frame_summary.filename or
-                last_line is None or last_line != frame_summary.lineno or
-                last_name is None or last_name != frame_summary.name):
+            if not is_repeat:
                 if count > _RECURSIVE_CUTOFF:
                     count -= _RECURSIVE_CUTOFF
-                    result.append(
+                    yield (
                         f'  [Previous line repeated {count} more '
                         f'time{"s" if count > 1 else ""}]\n'
                     )
@@ -765,18 +855,20 @@ def format(self, **kwargs):
             count += 1
             if count > _RECURSIVE_CUTOFF:
                 continue
-            result.append(formatted_frame)
+            yield formatted_frame
 
         if count > _RECURSIVE_CUTOFF:
             count -= _RECURSIVE_CUTOFF
-            result.append(
+            yield (
                 f'  [Previous line repeated {count} more '
                 f'time{"s" if count > 1 else ""}]\n'
             )
-        return result
 
 
 def _byte_offset_to_character_offset(str, offset):
+    if str.isascii():
+        # Fast track: byte and character offsets coincide for ASCII text
+        return min(offset, len(str))
     as_utf8 = str.encode('utf-8')
     return len(as_utf8[:offset].decode("utf-8", errors="replace"))
 
@@ -794,12 +886,23 @@ def _byte_offset_to_character_offset(str, offset):
     defaults=["~", "^"]
 )
 
-def _extract_caret_anchors_from_line_segment(segment):
-    """
-    Given source code `segment` corresponding to a FrameSummary, determine:
-        - for binary ops, the location of the binary op
-        - for indexing and function calls, the location of the brackets.
-    `segment` is expected to be a valid Python expression.
+# Patterns for finding the first character of a binary operator, the opening
+# bracket of a subscript and the opening parenthesis of a call.  Each also
+# matches the line continuation and comment characters, which are skipped.
+_BINOP_OPERATOR_RE = re.compile(r'[^\s)]')
+_LEFT_BRACKET_RE = re.compile(r'[\[\\#]')
+_LEFT_PAREN_RE = re.compile(r'[(\\#]')
+
+# Characters of which at least one must appear in a segment for it to
+# possibly be a binary operation, a subscript or a call.
+_ANCHOR_CHARS = frozenset("+-*/%@|&^<>[(")
+
+@functools.lru_cache(maxsize=256)
+def _parse_segment(segment):
+    """Parse `segment` as an expression, returning None on a syntax error.
+
+    The same segments recur in recursive or repeatedly raised tracebacks,
+    so the parsed trees are cached.
     """
     import ast
 
@@ -824,11 +927,26 @@ def _extract_caret_anchors_from_line_segment(segment):
         # )
         # Line locations will be different than the original,
         # which is taken into account later on.
-        tree = ast.parse(f"(\n{segment}\n)")
+        return ast.parse(f"(\n{segment}\n)")
     except SyntaxError:
         return None
 
-    if len(tree.body) != 1:
+
+def _extract_caret_anchors_from_line_segment(segment):
+    """
+    Given source code `segment` corresponding to a FrameSummary, determine:
+        - for binary ops, the location of the binary op
+        - for indexing and function calls, the location of the brackets.
+    `segment` is expected to be a valid Python expression.
+    """
+    if _ANCHOR_CHARS.isdisjoint(segment):
+        # Cannot be a binary operation, subscript or call; skip parsing.
+        return None
+
+    import ast
+
+    tree = _parse_segment(segment)
+    if tree is None or len(tree.body) != 1:
         return None
 
     lines = segment.splitlines()
@@ -847,12 +965,6 @@ def next_valid_char(lineno, col):
         assert lineno < len(lines) and col < len(lines[lineno])
         return lineno, col
 
-    def increment(lineno, col):
-        """Get the next valid character index in `lines`."""
-        col += 1
-        lineno, col = next_valid_char(lineno, col)
-        return lineno, col
-
     def nextline(lineno, col):
         """Get the next valid character at least on the next line"""
         col = 0
@@ -860,14 +972,17 @@ def nextline(lineno, col):
         lineno, col = next_valid_char(lineno, col)
         return lineno, col
 
-    def increment_until(lineno, col, stop):
-        """Get the next valid non-"\\#" character that satisfies the `stop` predicate"""
+    def increment_until(lineno, col, stop_re):
+        """Get the next valid non-"\\#" character matched by `stop_re`, which
+        must also match "\\" and "#"."""
         while True:
-            ch = lines[lineno][col]
-            if ch in "\\#":
+            match = stop_re.search(lines[lineno], col)
+            if match is None:
+                lineno, col = nextline(lineno, col)
+                continue
+            col = match.start()
+            if lines[lineno][col] in "\\#":
                 lineno, col = nextline(lineno, col)
-            elif not stop(ch):
-                lineno, col = increment(lineno, col)
             else:
                 break
         return lineno, col
@@ -894,7 +1009,7 @@ def setup_positions(expr, force_valid=True):
                     lineno, col = setup_positions(expr.left)
 
                     # First operator character is the first non-space/')' character
-                    lineno, col = increment_until(lineno, col, lambda x: not x.isspace() and x != ')')
+                    lineno, col = increment_until(lineno, col, _BINOP_OPERATOR_RE)
 
                     # binary op is 1 or 2 characters long, on the same line,
                     # before the right subexpression
@@ -921,7 +1036,7 @@ def setup_positions(expr, force_valid=True):
 
                     # find left bracket
                     left_lineno, left_col = setup_positions(expr.value)
-                    left_lineno, left_col = increment_until(left_lineno, left_col, lambda x: x == '[')
+                    left_lineno, left_col = increment_until(left_lineno, left_col, _LEFT_BRACKET_RE)
                     # find right bracket (final character of expression)
                     right_lineno, right_col = setup_positions(expr, force_valid=False)
                     return _Anchors(left_lineno, left_col, right_lineno, right_col)
@@ -933,7 +1048,7 @@ def setup_positions(expr, force_valid=True):
 
                     # find left bracket
                     left_lineno, left_col = setup_positions(expr.func)
-                    left_lineno, left_col = increment_until(left_lineno, left_col, lambda x: x == '(')
+                    left_lineno, left_col = increment_until(left_lineno, left_col, _LEFT_PAREN_RE)
                     # find right bracket (final character of expression)
                     right_lineno, right_col = setup_positions(expr, force_valid=False)
                     return _Anchors(left_lineno, left_col, right_lineno, right_col)
@@ -962,6 +1077,10 @@ def _display_width(line, offset=None):
     )
 
 
+# Blanks out every ASCII character except whitespace
+_NONSPACE_TO_SPACE = str.maketrans(
+    {chr(c): ' ' for c in range(128) if not chr(c).isspace()})
+
 
 class _ExceptionPrintContext:
     def __init__(self):
@@ -975,15 +1094,23 @@ def indent(self):
     def emit(self, text_gen, margin_char=None):
         if margin_char is None:
             margin_char = '|'
-        indent_str = self.indent()
-        if self.exception_group_depth:
-            indent_str += margin_char + ' '
+        if not self.exception_group_depth:
+            # Nothing to indent by
+            if isinstance(text_gen, str):
+                yield text_gen
+            else:
+                yield from text_gen
+            return
 
+        indent_str = self.indent() + margin_char + ' '
+        # Prefix every line, blank ones included
         if isinstance(text_gen, str):
-            yield textwrap.indent(text_gen, indent_str, lambda line: True)
+            yield ''.join([indent_str + line
+                           for line in text_gen.splitlines(keepends=True)])
         else:
             for text in text_gen:
-                yield textwrap.indent(text, indent_str, lambda line: True)
+                yield ''.join([indent_str + line
+                               for line in text.splitlines(keepends=True)])
 
 
 class TracebackException:
@@ -1032,19 +1159,42 @@ def __init__(self, exc_type, exc_value, exc_traceback, *, limit=None,
         # NB: we need to accept exc_traceback, exc_value, exc_traceback to
         # permit backwards compat with the existing API, otherwise we
         # need stub thunk objects just to glue it together.
-        # Handle loops in __cause__ or __context__.
-        is_recursive_call = _seen is not None
-        if _seen is None:
-            _seen = set()
-        _seen.add(id(exc_value))
-
+        # _seen is no longer used; it is accepted for backwards compatibility.
+        # Source lines read for one exception are shared with the rest of
+        # the exceptions built here, which often have frames in common.
+        segments = {}
+        self._populate(exc_type, exc_value, exc_traceback, limit=limit,
+                       lookup_lines=lookup_lines,
+                       capture_locals=capture_locals,
+                       max_group_width=max_group_width,
+                       max_group_depth=max_group_depth,
+                       save_exc_type=save_exc_type, segments=segments)
+        if (exc_value is None or
+            (exc_value.__cause__ is None and exc_value.__context__ is None
+             and not isinstance(exc_value, BaseExceptionGroup))):
+            # Nothing chained or nested: no need to walk the graph.
+            self.__cause__ = None
+            self.__context__ = None
+            self.exceptions = None
+            return
+        self._build_tree(exc_value, limit=limit,
+                         lookup_lines=lookup_lines,
+                         capture_locals=capture_locals, compact=compact,
+                         max_group_width=max_group_width,
+                         max_group_depth=max_group_depth, segments=segments)
+
+    def _populate(self, exc_type, exc_value, exc_traceback, *, limit,
+                  lookup_lines, capture_locals, max_group_width,
+                  max_group_depth, save_exc_type=True, segments=None):
+        # Fill in everything except __cause__, __context__ and exceptions,
+        # which are linked up by _build_tree().
         self.max_group_width = max_group_width
         self.max_group_depth = max_group_depth
 
         self.stack = StackSummary._extract_from_extended_frame_gen(
             _walk_tb_with_full_positions(exc_traceback),
             limit=limit, lookup_lines=lookup_lines,
-            capture_locals=capture_locals)
+            capture_locals=capture_locals, _segments=segments)
 
         self._exc_type = exc_type if save_exc_type else None
 
@@ -1092,7 +1242,7 @@ def __init__(self, exc_type, exc_value, exc_traceback, *, limit=None,
                 self._str += f". Did you mean: '{suggestion}'?"
             if issubclass(exc_type, NameError):
                 wrong_name = getattr(exc_value, "name", None)
-                if wrong_name is not None and wrong_name in sys.stdlib_module_names:
+                if wrong_name is not None and wrong_name in _STDLIB_MODULE_NAMES:
                     if suggestion:
                         self._str += f" Or did you forget to import '{wrong_name}'?"
                     else:
@@ -1102,74 +1252,69 @@ def __init__(self, exc_type, exc_value, exc_traceback, *, limit=None,
         self.__suppress_context__ = \
             exc_value.__suppress_context__ if exc_value is not None else False
 
-        # Convert __cause__ and __context__ to `TracebackExceptions`s, use a
-        # queue to avoid recursion (only the top-level call gets _seen == None)
-        if not is_recursive_call:
-            queue = [(self, exc_value)]
-            while queue:
-                te, e = queue.pop()
-                if (e and e.__cause__ is not None
-                    and id(e.__cause__) not in _seen):
-                    cause = TracebackException(
-                        type(e.__cause__),
-                        e.__cause__,
-                        e.__cause__.__traceback__,
-                        limit=limit,
-                        lookup_lines=lookup_lines,
-                        capture_locals=capture_locals,
-                        max_group_width=max_group_width,
-                        max_group_depth=max_group_depth,
-                        _seen=_seen)
-                else:
-                    cause = None
+    def _build_tree(self, exc_value, *, limit, lookup_lines,
+                    capture_locals, compact, max_group_width,
+                    max_group_depth, segments=None):
+        # Convert __cause__ and __context__ to `TracebackExceptions`s.  The
+        # graph is walked breadth-first with a queue rather than by
+        # recursion: every newly seen exception gets a bare instance which
+        # is linked into its parent straight away, and all of them are
+        # populated in a single flat pass once the walk is complete.
+        # Handle loops in __cause__ or __context__.
+        seen = {id(exc_value)}
+        pending = []
+        queue = collections.deque([(self, exc_value)])
+        while queue:
+            te, e = queue.popleft()
+            if (e and e.__cause__ is not None
+                and id(e.__cause__) not in seen):
+                seen.add(id(e.__cause__))
+                cause = TracebackException.__new__(TracebackException)
+                item = (cause, e.__cause__)
+                pending.append(item)
+                queue.append(item)
+            else:
+                cause = None
 
-                if compact:
-                    need_context = (cause is None and
-                                    e is not None and
-                                    not e.__suppress_context__)
-                else:
-                    need_context = True
-                if (e and e.__context__ is not None
-                    and need_context and id(e.__context__) not in _seen):
-                    context = TracebackException(
-                        type(e.__context__),
-                        e.__context__,
-                        e.__context__.__traceback__,
-                        limit=limit,
-                        lookup_lines=lookup_lines,
-                        capture_locals=capture_locals,
-                        max_group_width=max_group_width,
-                        max_group_depth=max_group_depth,
-                        _seen=_seen)
-                else:
-                    context = None
-
-                if e and isinstance(e, BaseExceptionGroup):
-                    exceptions = []
-                    for exc in e.exceptions:
-                        texc = TracebackException(
-                            type(exc),
-                            exc,
-                            exc.__traceback__,
-                            limit=limit,
-                            lookup_lines=lookup_lines,
-                            capture_locals=capture_locals,
-                            max_group_width=max_group_width,
-                            max_group_depth=max_group_depth,
-                            _seen=_seen)
-                        exceptions.append(texc)
-                else:
-                    exceptions = None
-
-                te.__cause__ = cause
-                te.__context__ = context
-                te.exceptions = exceptions
-                if cause:
-                    queue.append((te.__cause__, e.__cause__))
-                if context:
-                    queue.append((te.__context__, e.__context__))
-                if exceptions:
-                    queue.extend(zip(te.exceptions, e.exceptions))
+            if compact:
+                need_context = (cause is None and
+                                e is not None and
+                                not e.__suppress_context__)
+            else:
+                need_context = True
+            if (e and e.__context__ is not None
+                and need_context and id(e.__context__) not in seen):
+                seen.add(id(e.__context__))
+                context = TracebackException.__new__(TracebackException)
+                item = (context, e.__context__)
+                pending.append(item)
+                queue.append(item)
+            else:
+                context = None
+
+            if e and isinstance(e, BaseExceptionGroup):
+                exceptions = []
+                for exc in e.exceptions:
+                    seen.add(id(exc))
+                    texc = TracebackException.__new__(TracebackException)
+                    item = (texc, exc)
+                    pending.append(item)
+                    queue.append(item)
+                    exceptions.append(texc)
+            else:
+                exceptions = None
+
+            te.__cause__ = cause
+            te.__context__ = context
+            te.exceptions = exceptions
+
+        for te, e in pending:
+            te._populate(type(e), e, e.__traceback__, limit=limit,
+                         lookup_lines=lookup_lines,
+                         capture_locals=capture_locals,
+                         max_group_width=max_group_width,
+                         max_group_depth=max_group_depth,
+                         segments=segments)
 
     @classmethod
     def from_exception(cls, exc, *args, **kwargs):
@@ -1244,6 +1389,9 @@ def format_exception_only(self, *, show_group=False, _depth=0, **kwargs):
                 ]
             else:
                 yield _format_final_exc_line(stype, self._str, colorize=colorize)
+                if self.__notes__ is None and not (self.exceptions and show_group):
+                    # The common case: a single line with nothing to follow.
+                    return
         else:
             yield from [indent + l for l in self._format_syntax_error(stype, colorize=colorize)]
 
@@ -1308,7 +1456,12 @@ def _format_syntax_error(self, stype, **kwargs):
                 caretspace = ' '
                 if colno >= 0:
                     # non-space whitespace (likes tabs) must be kept for alignment
-                    caretspace = ((c if c.isspace() else ' ') for c in ltext[:colno])
+                    caretspace = ltext[:colno]
+                    if caretspace.isascii():
+                        caretspace = caretspace.translate(_NONSPACE_TO_SPACE)
+                    else:
+                        caretspace = ''.join([c if c.isspace() else ' '
+                                              for c in caretspace])
                     start_color = end_color = ""
                     if colorize:
                         # colorize from colno to end_colno
@@ -1321,7 +1474,7 @@ def _format_syntax_error(self, stype, **kwargs):
                         end_color = _ANSIColors.RESET
                     yield '    {}\n'.format(ltext)
                     yield '    {}{}{}{}\n'.format(
-                        "".join(caretspace),
+                        caretspace,
                         start_color,
                         ('^' * (end_colno - colno)),
                         end_color,
@@ -1447,22 +1600,15 @@ def print(self, *, file=None, chain=True, **kwargs):
         colorize = kwargs.get("colorize", False)
         if file is None:
             file = sys.stderr
-        for line in self.format(chain=chain, colorize=colorize):
-            print(line, file=file, end="")
+        print(''.join(self.format(chain=chain, colorize=colorize)),
+              file=file, end="")
 
 
 _MAX_CANDIDATE_ITEMS = 750
 _MAX_STRING_SIZE = 40
 _MOVE_COST = 2
 _CASE_COST = 1
-
-
-def _substitution_cost(ch_a, ch_b):
-    if ch_a == ch_b:
-        return 0
-    if ch_a.lower() == ch_b.lower():
-        return _CASE_COST
-    return _MOVE_COST
+_STDLIB_MODULE_NAMES = sys.stdlib_module_names
 
 
 def _compute_suggestion_error(exc_value, tb, wrong_name):
@@ -1488,19 +1634,21 @@ def _compute_suggestion_error(exc_value, tb, wrong_name):
         while tb.tb_next is not None:
             tb = tb.tb_next
         frame = tb.tb_frame
-        d = (
-            list(frame.f_locals)
-            + list(frame.f_globals)
-            + list(frame.f_builtins)
-        )
+        f_locals = frame.f_locals
 
         # Check first if we are in a method and the instance
         # has the wrong name as attribute
-        if 'self' in frame.f_locals:
-            self = frame.f_locals['self']
+        if 'self' in f_locals:
+            self = f_locals['self']
             if hasattr(self, wrong_name):
                 return f"self.{wrong_name}"
 
+        # Don't build the list of names only to find it is too long
+        if (len(f_locals) + len(frame.f_globals) + len(frame.f_builtins)
+                > _MAX_CANDIDATE_ITEMS):
+            return None
+        d = [*f_locals, *frame.f_globals, *frame.f_builtins]
+
     try:
         import _suggestions
     except ImportError:
@@ -1521,10 +1669,14 @@ def _compute_suggestion_error(exc_value, tb, wrong_name):
         if possible_name == wrong_name:
             # A missing attribute is "found". Don't suggest it (see GH-88821).
             continue
+        possible_name_len = len(possible_name)
         # No more than 1/3 of the involved characters should need changed.
-        max_distance = (len(possible_name) + wrong_name_len + 3) * _MOVE_COST // 6
+        max_distance = (possible_name_len + wrong_name_len + 3) * _MOVE_COST // 6
         # Don't take matches we've already beaten.
         max_distance = min(max_distance, best_distance - 1)
+        # The difference in length alone costs too much.
+        if abs(possible_name_len - wrong_name_len) * _MOVE_COST > max_distance:
+            continue
         current_distance = _levenshtein_distance(wrong_name, possible_name, max_distance)
         if current_distance > max_distance:
             continue
@@ -1565,25 +1717,45 @@ def _levenshtein_distance(a, b, max_cost):
     if (len(b) - len(a)) * _MOVE_COST > max_cost:
         return max_cost + 1
 
+    # Quick fail when the characters themselves are too different.  A
+    # case-only substitution leaves the case-folded characters unchanged;
+    # any other edit costs _MOVE_COST and changes at most two of their
+    # counts, or one of them and the length.
+    if len(a) >= 8:
+        counts = collections.Counter(map(str.lower, a))
+        counts.subtract(map(str.lower, b))
+        mismatched = sum(map(abs, counts.values()))
+        if (len(b) - len(a) + mismatched) * _MOVE_COST // 2 > max_cost:
+            return max_cost + 1
+
     # Instead of producing the whole traditional len(a)-by-len(b)
     # matrix, we can update just one row in place.
     # Initialize the buffer row
     row = list(range(_MOVE_COST, _MOVE_COST * (len(a) + 1), _MOVE_COST))
 
+    # The case-folded characters of a, for the substitution costs below
+    a_lower = [ch.lower() for ch in a]
     result = 0
     for bindex in range(len(b)):
         bchar = b[bindex]
+        blower = bchar.lower()
+        # The cost of substituting bchar for each character of a: nothing
+        # for the same character, _CASE_COST if only the case differs.
+        cost_row = [0 if ch == bchar else
+                    _CASE_COST if ch_lower == blower else
+                    _MOVE_COST
+                    for ch, ch_lower in zip(a, a_lower)]
         distance = result = bindex * _MOVE_COST
         minimum = sys.maxsize
         for index in range(len(a)):
             # 1) Previous distance in this row is cost(b[:b_index], a[:index])
-            substitute = distance + _substitution_cost(bchar, a[index])
+            substitute = distance + cost_row[index]
             # 2) cost(b[:b_index], a[:index+1]) from previous row
             distance = row[index]
             # 3) existing result is cost(b[:b_index+1], a[index])
 
-            insert_delete = min(result, distance) + _MOVE_COST
-            result = min(insert_delete, substitute)
+            insert_delete = (result if result < distance else distance) + _MOVE_COST
+            result = substitute if substitute < insert_delete else insert_delete
 
             # cost(b[:b_index+1], a[:index+1])
             row[index] = result